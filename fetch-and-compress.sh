@@ -7,6 +7,14 @@ sessionId=2
 sessionOrdinal=20251 
 legislatureOrdinal=69
 
+# Worker threads per document fetcher. They run side by side, so together they
+# share roughly the old single-fetcher budget of ~10 connections to api.legmt.gov.
+# Fiscal makes 2 API calls per bill (notes + rebuttals) to 1 each for legal and
+# amendments, so it gets twice the threads to finish around the same time.
+fiscalWorkers=6
+legalWorkers=3
+amendmentsWorkers=3
+
 # measure time taken for a command
 measure_time() {
     local start_time=$(date +%s)
@@ -17,14 +25,35 @@ measure_time() {
     echo "Time taken: ${elapsed_time} seconds"
 }
 
+# run a command with each line of its output prefixed by a label
+run_labeled() {
+    local label=$1
+    shift
+    measure_time "$@" 2>&1 | while IFS= read -r line; do echo "[$label] $line"; done
+    return ${PIPESTATUS[0]}
+}
+
 # grab bill list from legislative-interface
 measure_time python3 main/fetch_bill_list.py $sessionId
+# fiscal notes, legal notes and amendments don't depend on each other, so fetch them concurrently
 # grab fiscal notes
-measure_time python3 main/get_fiscal_review_notes.py "$sessionId" "$legislatureOrdinal" "$sessionOrdinal"
+run_labeled fiscal-notes python3 main/get_fiscal_review_notes.py "$sessionId" "$legislatureOrdinal" "$sessionOrdinal" --workers "$fiscalWorkers" &
+fiscal_pid=$!
 # grab legal nots
-measure_time python3 main/get_legal_review_notes.py "$sessionId" "$legislatureOrdinal" "$sessionOrdinal"
+run_labeled legal-notes python3 main/get_legal_review_notes.py "$sessionId" "$legislatureOrdinal" "$sessionOrdinal" --workers "$legalWorkers" &
+legal_pid=$!
 # grab amendments
-measure_time python3 main/get_amendments.py "$sessionId" "$legislatureOrdinal" "$sessionOrdinal"
+run_labeled amendments python3 main/get_amendments.py "$sessionId" "$legislatureOrdinal" "$sessionOrdinal" --workers "$amendmentsWorkers" &
+amendments_pid=$!
+# wait for all three before failing so none is left writing into data/
+fetch_failed=0
+wait $fiscal_pid || fetch_failed=1
+wait $legal_pid || fetch_failed=1
+wait $amendments_pid || fetch_failed=1
+if [ $fetch_failed -ne 0 ]; then
+    echo "One or more document fetchers failed"
+    exit 1
+fi
 # compress pdfs
 measure_time python3 main/compress_pdfs.py $sessionId
 # generate links for a pseudo-API
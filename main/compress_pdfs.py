@@ -2,53 +2,136 @@ import os
 import json
 import subprocess
 import hashlib
+import mmap
 import argparse
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Threads used to stat files while scanning for modified PDFs
+SCAN_WORKERS = 32
+
+# Files at least this large are memory-mapped for hashing
+MMAP_MIN_SIZE = 1 << 20
+
+# Length of the hex MD5 digests stored by older tracking files
+LEGACY_HASH_LENGTH = 32
+
+# Background thread writing the tracking file, if any, and the error it hit
+_save_thread = None
+_save_error = None
+
+# Compression options, set once per worker process by init_worker
+WORKER_OPTIONS = {}
+
 def load_tracking_data(tracking_file):
     """Load previously compressed files data"""
     if Path(tracking_file).exists():
+        if orjson is not None:
+            return orjson.loads(Path(tracking_file).read_bytes())
         with open(tracking_file, 'r') as f:
             return json.load(f)
     return {}
 
-def save_tracking_data(data, tracking_file):
-    """Save compressed files tracking data"""
-    with open(tracking_file, 'w') as f:
-        json.dump(data, f, indent=2)
+def serialize_tracking_data(data):
+    """Serialize compressed files tracking data to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode()
+
+def write_tracking_file(body, tracking_file):
+    """Write serialized tracking data, keeping any error for wait_for_tracking_save"""
+    global _save_error
+    try:
+        Path(tracking_file).write_bytes(body)
+    except Exception as e:
+        _save_error = e
+
+def save_tracking_data_in_background(data, tracking_file):
+    """Serialize tracking data now and write it to disk on a background thread"""
+    global _save_thread
+    # saves write the same file, so never let two overlap
+    wait_for_tracking_save()
+    # serializing here captures the current state without copying the dict
+    body = serialize_tracking_data(data)
+    _save_thread = threading.Thread(target=write_tracking_file, args=(body, tracking_file))
+    _save_thread.start()
 
-def get_file_hash(file_path):
+def wait_for_tracking_save():
+    """Block until any background tracking data save has finished, re-raising its error"""
+    global _save_thread, _save_error
+    if _save_thread is not None:
+        _save_thread.join()
+        _save_thread = None
+    if _save_error is not None:
+        error, _save_error = _save_error, None
+        raise error
+
+def get_file_hash(file_path, hash_func=hashlib.blake2b):
     """Get a hash of file contents for change detection"""
-    hash_md5 = hashlib.md5()
     with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+        # small files are cheaper to read outright than to map
+        if os.fstat(f.fileno()).st_size < MMAP_MIN_SIZE:
+            return hash_func(f.read()).hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hash_func(mm).hexdigest()
 
 def needs_compression(file_path, tracking_data):
-    """Check if file needs compression based on content hash"""
-    if not Path(file_path).exists():
-        return False
+    """Check if file needs compression based on size/mtime, then content hash
+    
+    Returns (needs, current_hash, file_stat); current_hash is None if the file
+    wasn't read, and file_stat is None if the file no longer exists.
+    """
+    try:
+        file_stat = Path(file_path).stat()
+    except FileNotFoundError:
+        return False, None, None
         
-    current_hash = get_file_hash(file_path)
     str_path = str(file_path)
     
     if str_path in tracking_data:
+        file_info = tracking_data[str_path]
+        stored_size = file_info.get("size", file_info.get("compressed_size"))
+        
+        # if the size changed, so has the content - no need to hash it
+        if stored_size is not None and stored_size != file_stat.st_size:
+            return True, None, file_stat
+        
+        # if size and mtime match, file hasn't changed - no need to read it
+        if (stored_size == file_stat.st_size and
+            file_info.get("mtime") == file_stat.st_mtime):
+            return False, None, file_stat
+        
+        # entries written before the switch to BLAKE2b hold MD5 digests;
+        # compare those as MD5 so already-compressed files aren't redone
+        if len(file_info["hash"]) == LEGACY_HASH_LENGTH:
+            return file_info["hash"] != get_file_hash(file_path, hashlib.md5), None, file_stat
+        
         # if hash matches, file hasn't changed
-        if tracking_data[str_path]["hash"] == current_hash:
-            return False
+        current_hash = get_file_hash(file_path)
+        return file_info["hash"] != current_hash, current_hash, file_stat
     
-    return True
+    return True, None, file_stat
+
+def init_worker(quality, dryrun, min_savings_percent):
+    """Store the session-wide compression options in a worker process"""
+    WORKER_OPTIONS.update(
+        quality=quality,
+        dryrun=dryrun,
+        min_savings_percent=min_savings_percent
+    )
 
-def compress_pdf(args):
+def compress_pdf(file_path):
     """Compress a single PDF file"""
-    file_path, tracking_data, quality, dryrun, min_savings_percent = args
-    str_path = str(file_path)
-    
-    if not needs_compression(file_path, tracking_data):
-        return False, file_path, "Unchanged"
+    quality = WORKER_OPTIONS["quality"]
+    dryrun = WORKER_OPTIONS["dryrun"]
+    min_savings_percent = WORKER_OPTIONS["min_savings_percent"]
         
     # Use a temporary file for compression
     temp_output = f"{file_path}.compressed.pdf"
@@ -70,10 +153,10 @@ def compress_pdf(args):
             '-dBATCH',
             f'-sOutputFile={temp_output}',
             str(file_path)
-        ], capture_output=True, text=True)
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
         
         if result.returncode != 0:
-            return False, file_path, f"Error: {result.stderr}"
+            return False, file_path, f"Error: {result.stderr.decode(errors='replace')}"
             
         # check if compression was successful and worthwhile
         original_size = os.path.getsize(file_path)
@@ -81,39 +164,35 @@ def compress_pdf(args):
         savings_threshold = 1 - (min_savings_percent / 100)
         
         if compressed_size < original_size * savings_threshold:  # file must be smaller by the threshold
+            # hash the compressed output before it replaces the original
+            compressed_hash = get_file_hash(temp_output)
+            
             # replace original with compressed version
             os.replace(temp_output, file_path)
+            file_stat = Path(file_path).stat()
             
-            # get hash of compressed file
-            compressed_hash = get_file_hash(file_path)
-            
-            # update tracking data
-            tracking_data[str_path] = {
+            # tracking entry for the main process to record
+            file_info = {
                 "hash": compressed_hash,
+                "size": file_stat.st_size,
+                "mtime": file_stat.st_mtime,
                 "original_size": original_size,
                 "compressed_size": compressed_size,
-                "compression_ratio": compressed_size / original_size,
-                "last_compressed": datetime.now().isoformat()
+                "compression_ratio": compressed_size / original_size
             }
             
             return True, file_path, {
                 "original_size": original_size,
                 "compressed_size": compressed_size,
                 "savings": original_size - compressed_size,
-                "percent": (1 - compressed_size/original_size) * 100
+                "percent": (1 - compressed_size/original_size) * 100,
+                "tracking": file_info
             }
         else:
-            # compression not worth it
+            # compression not worth it - the main process tracks the file
+            # so we don't try again
             os.remove(temp_output)
             
-            # track the file so we don't try again
-            tracking_data[str_path] = {
-                "hash": get_file_hash(file_path),
-                "skipped": True,
-                "reason": "minimal_savings",
-                "last_checked": datetime.now().isoformat()
-            }
-            
             return False, file_path, "Minimal savings"
             
     except Exception as e:
@@ -121,21 +200,33 @@ def compress_pdf(args):
             os.remove(temp_output)
         return False, file_path, f"Exception: {str(e)}"
 
+def iter_pdfs(directory):
+    """Yield a DirEntry for every PDF file in the directory (recursive)"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_pdfs(entry.path)
+            elif entry.name.endswith('.pdf'):
+                yield entry
+
 def find_pdf_files(directory):
     """Find all PDF files in the directory (recursive)"""
-    pdf_files = []
-    for path in Path(directory).rglob('*.pdf'):
-        pdf_files.append(path)
-    return pdf_files
+    return [Path(entry.path) for entry in iter_pdfs(str(Path(directory)))]
 
 def find_modified_pdfs(directory, tracking_data, max_age_hours=24):
-    """Find only PDF files that are new or modified since last check"""
+    """Find only PDF files that are new or modified since last check
+    
+    Returns the PDFs that need checking and the total number of PDFs found.
+    """
     pdf_files = []
+    total_files = 0
     current_time = datetime.now()
+    checked_at = current_time.isoformat()
     
-    # Walk through directory structure
-    for path in Path(directory).rglob('*.pdf'):
-        str_path = str(path)
+    def classify(entry):
+        """Return (path, needs_check, tracking updates) for a single PDF"""
+        path = Path(entry.path)
+        str_path = entry.path
         
         # Check if file is in tracking data
         if str_path in tracking_data:
@@ -149,7 +240,7 @@ def find_modified_pdfs(directory, tracking_data, max_age_hours=24):
                     # Skip files that were checked recently
                     age_hours = (current_time - last_checked).total_seconds() / 3600
                     if age_hours < max_age_hours:
-                        continue
+                        return path, False, None
                 except (ValueError, TypeError):
                     # If timestamp parsing fails, check the file
                     pass
@@ -157,7 +248,7 @@ def find_modified_pdfs(directory, tracking_data, max_age_hours=24):
             # If we have a hash, we can use that to see if the file changed
             if "hash" in file_info:
                 # Skip hash calculation if we have recent stats
-                file_stat = path.stat()
+                file_stat = entry.stat()
                 size = file_stat.st_size
                 mtime = file_stat.st_mtime
                 
@@ -165,29 +256,27 @@ def find_modified_pdfs(directory, tracking_data, max_age_hours=24):
                 if ("size" in file_info and "mtime" in file_info and 
                     file_info["size"] == size and file_info["mtime"] == mtime):
                     # Update the last_checked timestamp and continue
-                    file_info["last_checked"] = current_time.isoformat()
-                    continue
+                    return path, False, {"last_checked": checked_at}
         
         # If we got here, the file needs to be checked
-        pdf_files.append(path)
+        return path, True, None
     
-    return pdf_files
-
-def compress_pdf_directory(directory, tracking_file, quality='ebook', workers=None, 
-                          dryrun=False, min_savings_percent=5, max_age_hours=24):
-    """Compress all PDF files in the directory using multiple processes"""
-    # default workers to CPU count
-    if workers is None:
-        workers = os.cpu_count()
+    # Stat files in parallel (I/O bound), but only touch tracking data from this thread
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        for path, needs_check, updates in executor.map(classify, iter_pdfs(str(Path(directory)))):
+            total_files += 1
+            if updates:
+                tracking_data[str(path)].update(updates)
+            if needs_check:
+                pdf_files.append(path)
     
-    # load tracking data
-    tracking_data = load_tracking_data(tracking_file)
-    
-    # Find only PDFs that need checking
-    pdf_files = find_modified_pdfs(directory, tracking_data, max_age_hours)
-    
-    # Get total file count for reporting
-    total_files = sum(1 for _ in Path(directory).rglob('*.pdf'))
+    return pdf_files, total_files
+
+def compress_pdf_directory(directory, tracking_data, tracking_file, executor, 
+                          dryrun=False, max_age_hours=24):
+    """Compress all PDF files in the directory using the shared process pool"""
+    # Find only PDFs that need checking, counting all PDFs for reporting
+    pdf_files, total_files = find_modified_pdfs(directory, tracking_data, max_age_hours)
     
     if not pdf_files:
         print(f"No PDF files need checking in {directory} out of {total_files} total files")
@@ -195,75 +284,85 @@ def compress_pdf_directory(directory, tracking_file, quality='ebook', workers=No
     
     print(f"Checking {len(pdf_files)} of {total_files} PDF files in {directory}")
     
-    # Prepare arguments for the worker function
-    work_args = [(pdf_file, tracking_data, quality, dryrun, min_savings_percent) 
-                for pdf_file in pdf_files]
-    
     # Track results
     compressed_count = 0
     unchanged_count = 0
     error_count = 0
     total_savings = 0
     
-    # Process files in parallel
-    with ProcessPoolExecutor(max_workers=workers) as executor:
-        futures = [executor.submit(compress_pdf, args) for args in work_args]
+    # one timestamp for the whole batch
+    now_iso = datetime.now().isoformat()
+    
+    # Check for changes here so workers never need the tracking data
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as scan_executor:
+        changed = list(scan_executor.map(
+            lambda pdf_file: needs_compression(pdf_file, tracking_data), pdf_files))
+    
+    work_files = []
+    work_sizes = {}
+    current_hashes = {}
+    for pdf_file, (needs_check, current_hash, file_stat) in zip(pdf_files, changed):
+        if needs_check:
+            work_files.append(pdf_file)
+            work_sizes[pdf_file] = file_stat.st_size
+            # keep the hash so skipped files don't need to be read again
+            current_hashes[str(pdf_file)] = current_hash
+            continue
         
-        # Process results as they complete
-        for future in as_completed(futures):
-            success, file_path, result = future.result()
-            str_path = str(file_path)
+        unchanged_count += 1
+        str_path = str(pdf_file)
+        
+        # Update file stats for future quick checks
+        # (file_stat is None if the file disappeared during the scan)
+        if not dryrun and str_path in tracking_data and file_stat is not None:
+            tracking_data[str_path]["size"] = file_stat.st_size
+            tracking_data[str_path]["mtime"] = file_stat.st_mtime
+            tracking_data[str_path]["last_checked"] = now_iso
+    
+    # Start the largest files first so one big PDF doesn't hold up the tail
+    work_files.sort(key=work_sizes.get, reverse=True)
+    
+    # Process files in parallel, one at a time so idle workers always take
+    # the next largest file (batches would hand the biggest ones to one worker)
+    for success, file_path, result in executor.map(compress_pdf, work_files):
+        str_path = str(file_path)
+        
+        if success:
+            compressed_count += 1
+            savings = result["savings"]
+            total_savings += savings
             
-            if success:
-                compressed_count += 1
-                savings = result["savings"]
-                total_savings += savings
-                # print(f"Compressed: {file_path} - Saved {savings/1024:.1f}KB ({result['percent']:.1f}%)")
-            elif result == "Unchanged":
-                unchanged_count += 1
-                
-                # Update file stats for future quick checks
-                if not dryrun and str_path in tracking_data:
+            # Record the compressed file so later runs can skip it
+            if not dryrun:
+                tracking_data[str_path] = result["tracking"]
+                tracking_data[str_path]["last_compressed"] = now_iso
+            # print(f"Compressed: {file_path} - Saved {savings/1024:.1f}KB ({result['percent']:.1f}%)")
+        else:
+            error_count += 1
+            if result != "Minimal savings" and result != "Dry Run":
+                print(f"Failed: {file_path} - {result}")
+            
+            # Add to tracking data if not already present, or refresh it
+            # when a changed file didn't compress well enough
+            if not dryrun and (str_path not in tracking_data or result == "Minimal savings"):
+                try:
                     file_stat = Path(file_path).stat()
-                    tracking_data[str_path]["size"] = file_stat.st_size
-                    tracking_data[str_path]["mtime"] = file_stat.st_mtime
-                    tracking_data[str_path]["last_checked"] = datetime.now().isoformat()
-            else:
-                error_count += 1
-                if result != "Minimal savings" and result != "Dry Run":
-                    print(f"Failed: {file_path} - {result}")
-                
-                # Add to tracking data if not already present
-                if not dryrun and str_path not in tracking_data:
-                    try:
-                        file_stat = Path(file_path).stat()
-                        tracking_data[str_path] = {
-                            "hash": get_file_hash(file_path),
-                            "skipped": True,
-                            "reason": str(result),
-                            "size": file_stat.st_size,
-                            "mtime": file_stat.st_mtime,
-                            "last_checked": datetime.now().isoformat()
-                        }
-                    except Exception as e:
-                        print(f"Error adding failed file to tracking data: {e}")
+                    tracking_data[str_path] = {
+                        "hash": current_hashes[str_path] or get_file_hash(file_path),
+                        "skipped": True,
+                        "reason": str(result),
+                        "size": file_stat.st_size,
+                        "mtime": file_stat.st_mtime,
+                        "last_checked": now_iso
+                    }
+                except Exception as e:
+                    print(f"Error adding failed file to tracking data: {e}")
     
     # only save tracking data if not in dry run mode
     if not dryrun:
         # Print tracking data statistics before saving
         print(f"Saving tracking data with {len(tracking_data)} entries")
-        save_tracking_data(tracking_data, tracking_file)
-        
-        # Verify the save worked
-        try:
-            if Path(tracking_file).exists():
-                with open(tracking_file, 'r') as f:
-                    check_data = json.load(f)
-                print(f"Verified: Tracking file contains {len(check_data)} entries")
-            else:
-                print("WARNING: Tracking file was not created!")
-        except Exception as e:
-            print(f"Error verifying tracking file: {e}")
+        save_tracking_data_in_background(tracking_data, tracking_file)
     
     # print summary
     print(f"\nCompression Summary for {directory}:")
@@ -315,6 +414,14 @@ def main():
         data_dir / f"legal-note-pdfs-{session_id}"
     ]
     
+    # load tracking data once and share it across directories
+    tracking_data = load_tracking_data(tracking_file)
+    
+    # default workers to CPU count
+    workers = args.workers
+    if workers is None:
+        workers = os.cpu_count()
+    
     # Track overall stats
     total_compressed = 0
     total_unchanged = 0
@@ -323,27 +430,36 @@ def main():
     
     print(f"=== Starting PDF compression process for session {session_id} ===")
     
-    # Process each directory
-    for directory in directories:
-        if not directory.exists():
-            print(f"Directory not found: {directory}")
-            continue
-        
-        print(f"\nProcessing {directory}...")
-        compressed, unchanged, errors, savings = compress_pdf_directory(
-            directory, 
-            tracking_file, 
-            quality=args.quality, 
-            workers=args.workers, 
-            dryrun=args.dry_run, 
-            min_savings_percent=args.min_savings,
-            max_age_hours=args.max_age
-        )
-        
-        total_compressed += compressed
-        total_unchanged += unchanged
-        total_errors += errors
-        total_savings += savings
+    # Share one process pool across all directories so workers stay resident
+    # Options are handed to each worker once instead of with every file
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(args.quality, args.dry_run, args.min_savings)
+    ) as executor:
+        # Process each directory
+        for directory in directories:
+            if not directory.exists():
+                print(f"Directory not found: {directory}")
+                continue
+            
+            print(f"\nProcessing {directory}...")
+            compressed, unchanged, errors, savings = compress_pdf_directory(
+                directory, 
+                tracking_data,
+                tracking_file, 
+                executor,
+                dryrun=args.dry_run, 
+                max_age_hours=args.max_age
+            )
+            
+            total_compressed += compressed
+            total_unchanged += unchanged
+            total_errors += errors
+            total_savings += savings
+    
+    # make sure the last tracking data save has finished
+    wait_for_tracking_save()
     
     # Overall summary
     print(f"\n=== Overall Compression Summary ===")
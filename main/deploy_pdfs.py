@@ -1,30 +1,109 @@
-import os
+import json
+import hashlib
 import boto3
+from botocore.config import Config
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
 
 # Import shared configuration
 from config import BUILD_DIR, S3_BUCKET, S3_PREFIX
 
+# Hash, size and mtime of files already uploaded, keyed by S3 key
+MANIFEST_FILE = Path(__file__).parent.parent / "working" / "upload-manifest.json"
+
+# Files uploaded at once; the S3 connection pool is sized to cover their part transfers too
+UPLOAD_WORKERS = 32
+PART_CONCURRENCY = 4
+TRANSFER_CONFIG = TransferConfig(max_concurrency=PART_CONCURRENCY, multipart_threshold=8 * 1024 * 1024)
+
+def load_manifest():
+    """Load the upload manifest if it exists."""
+    if MANIFEST_FILE.exists():
+        with open(MANIFEST_FILE, "r") as f:
+            return json.load(f)
+    return {}
+
+def save_manifest(manifest):
+    """Save the upload manifest."""
+    MANIFEST_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+def get_file_hash(file_path):
+    """Get an MD5 hash of file contents for change detection."""
+    hash_md5 = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
 def sync_to_s3():
-    """Sync the build directory to S3 using AWS CLI."""
-    import subprocess
-    
+    """Upload new or changed files in the build directory to S3."""
     if not BUILD_DIR.exists():
         print(f"Build directory {BUILD_DIR} does not exist. Run fetch_pdfs.py first.")
         return False
-    
-    cmd = [
-        "aws", "s3", "sync",
-        str(BUILD_DIR),
-        f"s3://{S3_BUCKET}/{S3_PREFIX}",
-        "--content-type", "application/pdf"
-    ]
-    
-    print(f"Running: {' '.join(cmd)}")
-    result = subprocess.run(cmd, check=False)
-    
-    if result.returncode == 0:
+
+    manifest = load_manifest()
+    prefix = S3_PREFIX.rstrip("/")
+
+    # Only upload files whose contents changed since the last successful upload
+    pending = []
+    for path in BUILD_DIR.rglob("*"):
+        if not path.is_file():
+            continue
+        rel = path.relative_to(BUILD_DIR).as_posix()
+        # an empty prefix puts files at the bucket root, with no leading slash
+        key = "/".join(p for p in (prefix, rel) if p)
+        stat = path.stat()
+        entry = manifest.get(key)
+        # Older manifests stored just the hash string
+        if not isinstance(entry, dict):
+            entry = {"hash": entry}
+
+        # Unchanged size and mtime means the file hasn't been touched since upload
+        if entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            continue
+
+        file_hash = get_file_hash(path)
+        if entry.get("hash") == file_hash:
+            # Contents match the uploaded copy, so just refresh the stat info
+            manifest[key] = {"hash": file_hash, "size": stat.st_size, "mtime": stat.st_mtime}
+        else:
+            pending.append((path, key, file_hash, stat.st_size, stat.st_mtime))
+
+    print(f"Uploading {len(pending)} changed files to s3://{S3_BUCKET}/{prefix}")
+
+    client = boto3.client("s3", config=Config(max_pool_connections=UPLOAD_WORKERS * PART_CONCURRENCY))
+
+    def upload(path, key):
+        client.upload_file(
+            str(path), S3_BUCKET, key,
+            ExtraArgs={"ContentType": "application/pdf"},
+            Config=TRANSFER_CONFIG
+        )
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+        futures = {
+            executor.submit(upload, path, key): (key, file_hash, size, mtime)
+            for path, key, file_hash, size, mtime in pending
+        }
+        for future in as_completed(futures):
+            key, file_hash, size, mtime = futures[future]
+            try:
+                future.result()
+                manifest[key] = {"hash": file_hash, "size": size, "mtime": mtime}
+            except Exception as e:
+                print(f"Failed to upload {key}: {e}")
+                failed += 1
+
+    # Record successful uploads even if some failed, so a retry only sends the rest
+    save_manifest(manifest)
+
+    if failed == 0:
         print("S3 sync completed successfully")
         return True
     else:
-        print(f"S3 sync failed with exit code {result.returncode}")
+        print(f"S3 sync failed for {failed} files")
         return False
\ No newline at end of file
@@ -25,16 +25,39 @@ def fetch_bills_list(session_id):
     url = f"https://raw.githubusercontent.com/mtfreepress/legislative-interface/refs/heads/main/list-bills-{session_id}.json"
     output_path = working_dir / f"list-bills-{session_id}.json"
     
+    etag_path = working_dir / f"list-bills-{session_id}.json.etag"
+    
+    # Send the ETag from the last fetch so an unchanged list comes back as a 304
+    headers = {'Accept-Encoding': 'gzip'}
+    if output_path.exists() and etag_path.exists():
+        headers['If-None-Match'] = etag_path.read_text().strip()
+    
     print(f"Fetching bills list from: {url}")
     
     try:
         # Fetch the JSON
-        response = requests.get(url)
-        response.raise_for_status()  # Raise exception for non-200 status codes
-        
-        # Save to file
-        with open(output_path, 'wb') as f:
-            f.write(response.content)
+        with requests.get(url, headers=headers, stream=True) as response:
+            if response.status_code == 304:
+                print(f"Bills list unchanged, keeping: {output_path}")
+                return output_path
+            
+            response.raise_for_status()  # Raise exception for non-200 status codes
+            
+            # Stream to a temporary file so a failed download can't clobber the last good list
+            temp_path = output_path.with_suffix('.json.part')
+            try:
+                with open(temp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        f.write(chunk)
+                os.replace(temp_path, output_path)
+            finally:
+                temp_path.unlink(missing_ok=True)
+            
+            etag = response.headers.get('ETag')
+            if etag:
+                etag_path.write_text(etag)
+            elif etag_path.exists():
+                etag_path.unlink()
         
         print(f"Successfully saved bills list to: {output_path}")
         return output_path
@@ -4,8 +4,112 @@ import json
 import re
 import argparse
 import shutil
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Threads used to scan bill folders (I/O bound)
+SCAN_WORKERS = (os.cpu_count() or 1) * 4
+
+# Threads used to write the per-bill JSON files
+WRITE_WORKERS = 16
+
+# Parenthetical suffixes like (1), (2) etc.
+SUFFIX_RE = re.compile(r'\((\d+)\)\.pdf$', re.IGNORECASE)
+
+# HB-2 amendment files with section codes
+HB2_RE = re.compile(r'([A-Z]{2})0*(\d+)\.(\d+)\.(\d+)\.([A-Z])\.(\d+)_[^_]+_(final-\w+)(?:\.pdf)?', re.IGNORECASE)
+
+# Standard amendment files for all other bills
+STD_RE = re.compile(r'([A-Z]{2})0*(\d+)((?:\.\d+)+(?:\.[A-Z]\.\d+)*)_[^_]+_(final-\w+)(?:\.pdf)?', re.IGNORECASE)
+
+# Map HB-2 section letters to names
+SECTION_MAP = {
+    'A': 'general-government',
+    'B': 'health',
+    'C': 'nat-resource-transportation',
+    'D': 'public-safety',
+    'E': 'k-12-education',
+    'F': 'long-range',
+    'O': 'global-amendment'
+}
+
+def write_json(path, data, indent=True):
+    """Write data as JSON, indented by 2 spaces or compact."""
+    if orjson is not None:
+        body = orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    elif indent:
+        body = json.dumps(data, indent=2).encode()
+    else:
+        body = json.dumps(data, separators=(',', ':')).encode()
+    
+    # Write the bytes directly to the file descriptor, skipping Python's buffered file layers
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(body)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def process_bill_dir(bill_dir, doc_type):
+    """Build the sorted file entries for one bill folder; returns (bill_id, files_data)."""
+    bill_id = bill_dir.name
+    # scandir gives us names and file types without a stat per entry
+    with os.scandir(bill_dir) as entries:
+        pdf_files = [
+            entry.name for entry in entries
+            if entry.is_file() and not entry.name.startswith('.')
+            and entry.name.lower().endswith('.pdf')
+        ]
+    
+    files_data = []
+    
+    for file_name in pdf_files:
+        name = file_name.replace('.pdf', '')
+        
+        # Extract parenthetical suffixes like (1), (2) etc.
+        suffix_match = SUFFIX_RE.search(file_name)
+        suffix = f"({suffix_match.group(1)})" if suffix_match else ''
+        
+        # Both patterns need "_final-", so skip the regexes for files that can't match
+        if '_final-' in file_name.lower():
+            # Special handling for HB-2 with section letters
+            if bill_id == 'HB-2':
+                section_match = HB2_RE.match(file_name)
+                
+                if section_match:
+                    prefix, bill_num, major, minor, section_letter, amend_num, final_type = section_match.groups()
+                    
+                    section_name = SECTION_MAP.get(section_letter.upper(), section_letter)
+                    
+                    # Format the name
+                    name = f"{prefix}-{bill_num}.{major}.{minor}.{section_letter}.{amend_num}.{section_name}.{final_type}{suffix}"
+        
+            # Standard processing for all other bills
+            else:
+                matches = STD_RE.match(file_name)
+                if matches:
+                    prefix, bill_num, version_info, final_type = matches.groups()
+                    # Add suffix to the name
+                    name = f"{prefix}-{bill_num}{version_info}.{final_type}{suffix}"
+        
+        # Add the file entry
+        files_data.append({
+            'name': name,
+            'url': f"/capitol-tracker-2025/{doc_type}/{bill_id}/{file_name}"
+        })
+    
+    # Sort files by name
+    files_data.sort(key=lambda x: x['name'].lower())
+    return bill_id, files_data
+
 def generate_document_index(session_id):
     """Generate document index for amendments, fiscal notes, and legal notes."""
     print('Generating document index...')
@@ -46,103 +150,48 @@ def generate_document_index(session_id):
     bills_with_fiscal_notes = []
     bills_with_legal_notes = []
     
+    # Bill list for each document type
+    bill_lists = {
+        'amendments': bills_with_amendments,
+        'fiscal-notes': bills_with_fiscal_notes,
+        'legal-notes': bills_with_legal_notes
+    }
+    
     # Initialize bill document types mapping
-    bill_document_types = {}
+    bill_document_types = defaultdict(list)
     
-    # Process each document type
-    for doc_type in document_types:
-        source_dir = source_dirs[doc_type]
-        document_index[doc_type] = {}
-        
-        if not source_dir.exists():
-            print(f"Directory doesn't exist: {source_dir}")
-            continue
-            
-        print(f"Scanning {doc_type} directory...")
-        
-        try:
-            # Get all bill folders
-            bill_dirs = [d for d in source_dir.iterdir() if d.is_dir()]
+    # Process each document type, scanning bill folders in parallel (I/O bound)
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        for doc_type in document_types:
+            source_dir = source_dirs[doc_type]
+            document_index[doc_type] = {}
             
-            for bill_dir in bill_dirs:
-                bill_id = bill_dir.name
-                pdf_files = [f for f in bill_dir.iterdir() if f.name.lower().endswith('.pdf')]
+            if not source_dir.exists():
+                print(f"Directory doesn't exist: {source_dir}")
+                continue
                 
-                if not pdf_files:
-                    continue
-                
-                files_data = []
+            print(f"Scanning {doc_type} directory...")
+            
+            try:
+                # Get all bill folders
+                bill_dirs = [d for d in source_dir.iterdir() if d.is_dir()]
                 
-                for pdf_file in pdf_files:
-                    file_name = pdf_file.name
-                    name = file_name.replace('.pdf', '')
+                # map keeps results in folder order so the output is deterministic
+                for bill_id, files_data in executor.map(process_bill_dir, bill_dirs, repeat(doc_type)):
+                    if not files_data:
+                        continue
                     
-                    # Extract parenthetical suffixes like (1), (2) etc.
-                    suffix_match = re.search(r'\((\d+)\)\.pdf$', file_name, re.IGNORECASE)
-                    suffix = f"({suffix_match.group(1)})" if suffix_match else ''
+                    document_index[doc_type][bill_id] = files_data
                     
-                    # Special handling for HB-2 with section letters
-                    if bill_id == 'HB-2':
-                        # Pattern to match HB-2 amendment files with section codes
-                        section_pattern = r'([A-Z]{2})0*(\d+)\.(\d+)\.(\d+)\.([A-Z])\.(\d+)_[^_]+_(final-\w+)(?:\.pdf)?'
-                        section_match = re.match(section_pattern, file_name, re.IGNORECASE)
-                        
-                        if section_match:
-                            prefix, bill_num, major, minor, section_letter, amend_num, final_type = section_match.groups()
-                            
-                            # Map section letters to names
-                            section_map = {
-                                'A': 'general-government',
-                                'B': 'health',
-                                'C': 'nat-resource-transportation',
-                                'D': 'public-safety',
-                                'E': 'k-12-education',
-                                'F': 'long-range',
-                                'O': 'global-amendment'
-                            }
-                            
-                            section_name = section_map.get(section_letter.upper(), section_letter)
-                            
-                            # Format the name
-                            name = f"{prefix}-{bill_num}.{major}.{minor}.{section_letter}.{amend_num}.{section_name}.{final_type}{suffix}"
-                    
-                    # Standard processing for all other bills
-                    else:
-                        matches = re.match(r'([A-Z]{2})0*(\d+)((?:\.\d+)+(?:\.[A-Z]\.\d+)*)_[^_]+_(final-\w+)(?:\.pdf)?', file_name, re.IGNORECASE)
-                        if matches:
-                            prefix, bill_num, version_info, final_type = matches.groups()
-                            # Add suffix to the name
-                            name = f"{prefix}-{bill_num}{version_info}.{final_type}{suffix}"
-                    
-                    # Add the file entry
-                    files_data.append({
-                        'name': name,
-                        'url': f"/capitol-tracker-2025/{doc_type}/{bill_id}/{file_name}"
-                    })
-                
-                # Sort files by name
-                files_data.sort(key=lambda x: x['name'].lower())
-                document_index[doc_type][bill_id] = files_data
-                
-                # Add bill to appropriate list if it has documents
-                if files_data:
+                    # Add bill to appropriate list
                     bill_space_format = bill_id.replace('-', ' ')  # Convert from "HB-123" to "HB 123"
                     
-                    # Add to bill_document_types
-                    if bill_id not in bill_document_types:
-                        bill_document_types[bill_id] = []
                     bill_document_types[bill_id].append(doc_type)
-                    
-                    if doc_type == 'amendments':
-                        bills_with_amendments.append(bill_space_format)
-                    elif doc_type == 'fiscal-notes':
-                        bills_with_fiscal_notes.append(bill_space_format)
-                    elif doc_type == 'legal-notes':
-                        bills_with_legal_notes.append(bill_space_format)
-            
-        except Exception as e:
-            print(f"Error processing {doc_type} directory: {e}")
-            document_index[doc_type] = {}
+                    bill_lists[doc_type].append(bill_space_format)
+                
+            except Exception as e:
+                print(f"Error processing {doc_type} directory: {e}")
+                document_index[doc_type] = {}
     
     # Sort function for bills
     def sort_key(bill):
@@ -165,28 +214,30 @@ def generate_document_index(session_id):
         f.write('\n'.join(bills_with_legal_notes))
     
     # Write document index
-    with open(output_path, 'w') as f:
-        json.dump(document_index, f, indent=2)
+    write_json(output_path, document_index)
     
     # Write bill document types index
-    with open(bill_document_types_path, 'w') as f:
-        json.dump(bill_document_types, f, indent=2)
+    write_json(bill_document_types_path, bill_document_types)
     
     # Generate individual bill JSON files
     bill_ids = set()
     for doc_type in document_types:
         bill_ids.update(document_index[doc_type].keys())
     
+    bill_json_paths = []
+    bill_infos = []
     for bill_id in bill_ids:
         bill_info = {}
         for doc_type in document_types:
             if bill_id in document_index[doc_type]:
                 bill_info[doc_type] = document_index[doc_type][bill_id]
         
-        # Write the bill-specific JSON
-        bill_json_path = bills_dir / f"{bill_id}.json"
-        with open(bill_json_path, 'w') as f:
-            json.dump(bill_info, f, indent=2)
+        bill_json_paths.append(bills_dir / f"{bill_id}.json")
+        bill_infos.append(bill_info)
+    
+    # Write the bill-specific JSONs in parallel; consuming the results raises any write error
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as executor:
+        list(executor.map(write_json, bill_json_paths, bill_infos, repeat(False)))
     
     print(f"Generated bills-with-amendments list with {len(bills_with_amendments)} bills")
     print(f"Generated bills-with-fiscal-notes list with {len(bills_with_fiscal_notes)} bills")
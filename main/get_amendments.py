@@ -1,48 +1,68 @@
 import os
 import json
+import shutil
 import requests
 import argparse
 import re
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from operator import itemgetter
 from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
 from urllib3.util.retry import Retry
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configuration
 BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR.parent / "data"
 API_BASE_URL = "https://api.legmt.gov"
 
+# Match pattern like "filename(1).pdf" or "filename(2).pdf" to get duplicates
+BASE_FILENAME_RE = re.compile(r'^(.+?)(?:\([0-9]+\))?(\.[^.]+)$')
+
 def load_json(file_path):
     """Load JSON data from file if it exists."""
     if Path(file_path).exists():
+        if orjson is not None:
+            return orjson.loads(Path(file_path).read_bytes())
         with open(file_path, "r") as f:
             return json.load(f)
     return []
 
-def download_file(url, dest_folder, file_name):
-    """Download a file from URL to destination folder."""
-    dest_folder.mkdir(parents=True, exist_ok=True)
-    
-    response = requests.get(url)
-    if response.status_code == 200:
-        file_path = dest_folder / file_name
-        with open(file_path, "wb") as f:
-            f.write(response.content)
-        # print(f"Downloaded: {file_path}")
-        return True
-    else:
-        print(f"Failed to download: {url}")
-        return False
-
-def list_files_in_directory(subdir):
-    """List all files in directory except hidden files."""
-    if subdir.exists():
-        return {f.name for f in subdir.iterdir() if f.is_file() and not f.name.startswith('.')}
-    return set()
-
-def create_session_with_retries():
-    """Create a requests session with retry capability."""
+def download_file(session, url, dest_folder, file_name):
+    """Download a file from URL to an existing destination folder."""
+    # Stream the body to disk rather than holding the whole PDF in memory
+    with session.get(url, stream=True, timeout=(5, 60)) as response:
+        if response.status_code == 200:
+            file_path = dest_folder / file_name
+            # Write to a .part file and only move it into place once complete,
+            # so an interrupted download never leaves a truncated PDF behind
+            temp_path = dest_folder / f"{file_name}.part"
+            try:
+                # Copy straight from the socket into the file; let urllib3 undo any gzip
+                response.raw.decode_content = True
+                with open(temp_path, "wb") as f:
+                    shutil.copyfileobj(response.raw, f, length=1024 * 1024)
+                os.replace(temp_path, file_path)
+            except Urllib3Error as e:
+                # reading response.raw bypasses requests' exception wrapping
+                print(f"Failed to download: {url} ({e})")
+                return False
+            finally:
+                temp_path.unlink(missing_ok=True)
+            # print(f"Downloaded: {file_path}")
+            return True
+        else:
+            print(f"Failed to download: {url}")
+            return False
+
+def create_session_with_retries(pool_maxsize=10):
+    """Create a requests session with retry capability, sized for pool_maxsize threads."""
     session = requests.Session()
     retry = Retry(
         total=5,
@@ -50,7 +70,7 @@ def create_session_with_retries():
         status_forcelist=[429, 500, 502, 503, 504],
         allowed_methods=["HEAD", "GET", "OPTIONS", "POST"]
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
     session.mount("https://", adapter)
     session.mount("http://", adapter)
     return session
@@ -66,6 +86,8 @@ def fetch_amendment_documents(session, legislature_ordinal, session_ordinal, bil
     }
     response = session.get(url, params=params)
     if response.status_code == 200:
+        if orjson is not None:
+            return orjson.loads(response.content)
         return response.json()
     else:
         print(f"Error fetching amendment documents: {response.status_code} for bill: {bill_type} {bill_number}")
@@ -81,11 +103,10 @@ def fetch_pdf_url(session, document_id):
         print(f"Error fetching PDF URL for document {document_id}: {response.status_code}")
         return None
     
+@lru_cache(maxsize=4096)
 def get_base_filename(filename):
     """Extract base filename without the (N) suffix."""
-    # Match pattern like "filename(1).pdf" or "filename(2).pdf" to get duplicates
-    pattern = r'^(.+?)(?:\([0-9]+\))?(\.[^.]+)$'
-    match = re.match(pattern, filename)
+    match = BASE_FILENAME_RE.match(filename)
     if match:
         base_name = match.group(1)
         extension = match.group(2)
@@ -111,14 +132,13 @@ def group_amendments_by_base_name(amendments):
         primary = next((v for v in versions if v["fileName"] == base_name), None)
         if not primary:
             # If no clean version, take the highest ID (latest version)
-            primary = max(versions, key=lambda x: x["id"])
+            primary = max(versions, key=itemgetter("id"))
         primary_amendments.append(primary)
     
     return primary_amendments
 
-def fetch_and_save_amendments(bill, legislature_ordinal, session_ordinal, download_dir):
+def fetch_and_save_amendments(session, bill, legislature_ordinal, session_ordinal, download_dir):
     """Fetch and save amendments for a bill."""
-    session = create_session_with_retries()
     bill_type = bill["billType"]
     bill_number = bill["billNumber"]
 
@@ -130,9 +150,16 @@ def fetch_and_save_amendments(bill, legislature_ordinal, session_ordinal, downlo
 
     unique_amendments = group_amendments_by_base_name(amendment_documents)
     
+    # Collect base names of files we already have in a single pass over the folder
     dest_folder = download_dir / f"{bill_type}-{bill_number}"
-    existing_files = list_files_in_directory(dest_folder)
-    existing_base_files = {get_base_filename(file) for file in existing_files}
+    existing_base_files = set()
+    folder_exists = dest_folder.exists()
+    if folder_exists:
+        with os.scandir(dest_folder) as entries:
+            existing_base_files = {
+                get_base_filename(e.name) for e in entries
+                if e.is_file() and not e.name.startswith('.')
+            }
 
     for amendment in unique_amendments:
         document_id = amendment["id"]
@@ -143,7 +170,11 @@ def fetch_and_save_amendments(bill, legislature_ordinal, session_ordinal, downlo
         if base_name not in existing_base_files:
             pdf_url = fetch_pdf_url(session, document_id)
             if pdf_url:
-                download_file(pdf_url, dest_folder, file_name)
+                # Create the folder once, on the first download for this bill
+                if not folder_exists:
+                    dest_folder.mkdir(parents=True, exist_ok=True)
+                    folder_exists = True
+                download_file(session, pdf_url, dest_folder, file_name)
             else:
                 print(f"Failed to fetch PDF URL for amendment ID: {document_id}")
 
@@ -152,6 +183,9 @@ def main():
     parser.add_argument("sessionId", type=str, help="Legislative session ID")
     parser.add_argument("legislatureOrdinal", type=int, help="Legislature ordinal")
     parser.add_argument("sessionOrdinal", type=int, help="Session ordinal")
+    parser.add_argument("--workers", type=int, default=16,
+                        help="Number of bills to fetch concurrently when run on its own "
+                             "(default: 16); fetch-and-compress.sh sets its own split")
     args = parser.parse_args()
 
     session_id = args.sessionId
@@ -174,10 +208,14 @@ def main():
     download_dir = DATA_DIR / f"amendments"
     print(f"Download directory: {download_dir}")
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
+    # One session for the whole run so its connection pool is actually reused
+    session = create_session_with_retries(pool_maxsize=args.workers)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
         futures = [
             executor.submit(
                 fetch_and_save_amendments, 
+                session,
                 bill, 
                 legislature_ordinal, 
                 session_ordinal, 
@@ -1,12 +1,20 @@
 import os
 import json
+import shutil
 import requests
 import argparse
+from operator import itemgetter
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
 from urllib3.util.retry import Retry
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configuration
 BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR.parent / "data"
@@ -15,33 +23,49 @@ API_BASE_URL = "https://api.legmt.gov"
 def load_json(file_path):
     """Load JSON data from file if it exists."""
     if Path(file_path).exists():
+        if orjson is not None:
+            return orjson.loads(Path(file_path).read_bytes())
         with open(file_path, "r") as f:
             return json.load(f)
     return []
 
-def download_file(url, dest_folder, file_name):
-    """Download a file from URL to destination folder."""
-    dest_folder.mkdir(parents=True, exist_ok=True)
-    
-    response = requests.get(url)
-    if response.status_code == 200:
-        file_path = dest_folder / file_name
-        with open(file_path, "wb") as f:
-            f.write(response.content)
-        # print(f"Downloaded: {file_path}")
-        return True
-    else:
-        print(f"Failed to download: {url}")
-        return False
+def download_file(session, url, dest_folder, file_name):
+    """Download a file from URL to an existing destination folder."""
+    # Stream the body to disk rather than holding the whole PDF in memory
+    with session.get(url, stream=True, timeout=(5, 60)) as response:
+        if response.status_code == 200:
+            file_path = dest_folder / file_name
+            # Write to a .part file and only move it into place once complete,
+            # so an interrupted download never leaves a truncated PDF behind
+            temp_path = dest_folder / f"{file_name}.part"
+            try:
+                # Copy straight from the socket into the file; let urllib3 undo any gzip
+                response.raw.decode_content = True
+                with open(temp_path, "wb") as f:
+                    shutil.copyfileobj(response.raw, f, length=1024 * 1024)
+                os.replace(temp_path, file_path)
+            except Urllib3Error as e:
+                # reading response.raw bypasses requests' exception wrapping
+                print(f"Failed to download: {url} ({e})")
+                return False
+            finally:
+                temp_path.unlink(missing_ok=True)
+            # print(f"Downloaded: {file_path}")
+            return True
+        else:
+            print(f"Failed to download: {url}")
+            return False
 
 def list_files_in_directory(subdir):
     """List all files in directory except hidden files."""
-    if subdir.exists():
-        return {f.name for f in subdir.iterdir() if f.is_file() and not f.name.startswith('.')}
-    return set()
-
-def create_session_with_retries():
-    """Create a requests session with retry capability."""
+    try:
+        with os.scandir(subdir) as entries:
+            return {e.name for e in entries if e.is_file() and not e.name.startswith('.')}
+    except FileNotFoundError:
+        return set()
+
+def create_session_with_retries(pool_maxsize=10):
+    """Create a requests session with retry capability, sized for pool_maxsize threads."""
     session = requests.Session()
     retry = Retry(
         total=5,
@@ -49,7 +73,7 @@ def create_session_with_retries():
         status_forcelist=[429, 500, 502, 503, 504],
         allowed_methods=["HEAD", "GET", "OPTIONS", "POST"]
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
     session.mount("https://", adapter)
     session.mount("http://", adapter)
     return session
@@ -65,6 +89,8 @@ def fetch_document_ids(session, legislature_ordinal, session_ordinal, bill_type,
     }
     response = session.get(url, params=params)
     if response.status_code == 200:
+        if orjson is not None:
+            return orjson.loads(response.content)
         return response.json()
     else:
         print(f"Error fetching document IDs: {response.status_code} for bill: {bill_type} {bill_number}")
@@ -82,18 +108,10 @@ def fetch_pdf_url(session, document_id):
 
 def get_latest_document(documents):
     """Get the latest document based on document ID."""
-    latest_document = None
-    latest_id = None
-    for document in documents:
-        document_id = document["id"]
-        if latest_id is None or document_id > latest_id:
-            latest_id = document_id
-            latest_document = document
-    return latest_document
-
-def fetch_and_save_legal_review_notes(bill, legislature_ordinal, session_ordinal, download_dir):
+    return max(documents, key=itemgetter("id"), default=None)
+
+def fetch_and_save_legal_review_notes(session, bill, legislature_ordinal, session_ordinal, download_dir):
     """Fetch and save legal notes for a bill."""
-    session = create_session_with_retries()
     bill_type = bill["billType"]
     bill_number = bill["billNumber"]
 
@@ -113,7 +131,8 @@ def fetch_and_save_legal_review_notes(bill, legislature_ordinal, session_ordinal
             document_id = latest_document["id"]
             pdf_url = fetch_pdf_url(session, document_id)
             if pdf_url:
-                download_file(pdf_url, dest_folder, file_name)
+                dest_folder.mkdir(parents=True, exist_ok=True)
+                download_file(session, pdf_url, dest_folder, file_name)
             else:
                 print(f"Failed to fetch PDF URL for document ID: {document_id}")
     else:
@@ -126,6 +145,9 @@ def main():
     parser.add_argument("sessionId", type=str, help="Legislative session ID")
     parser.add_argument("legislatureOrdinal", type=int, help="Legislature ordinal")
     parser.add_argument("sessionOrdinal", type=int, help="Session ordinal")
+    parser.add_argument("--workers", type=int, default=16,
+                        help="Number of bills to fetch concurrently when run on its own "
+                             "(default: 16); fetch-and-compress.sh sets its own split")
     args = parser.parse_args()
 
     session_id = args.sessionId
@@ -148,10 +170,14 @@ def main():
     download_dir = DATA_DIR / f"legal-notes"
     print(f"Download directory: {download_dir}")
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
+    # One session for the whole run so its connection pool is actually reused
+    session = create_session_with_retries(pool_maxsize=args.workers)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
         futures = [
             executor.submit(
                 fetch_and_save_legal_review_notes, 
+                session,
                 bill, 
                 legislature_ordinal, 
                 session_ordinal, 